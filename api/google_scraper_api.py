@@ -6,26 +6,37 @@ API REST para realizar búsquedas en Google sin limitaciones usando web scraping
 
 from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+import os
 import asyncio
+import codecs
 import aiohttp
-from bs4 import BeautifulSoup
+from cachetools import TTLCache
+import lxml.html
+from lxml import etree
 import random
 import time
 import re
+import threading
+from collections import defaultdict
 from datetime import datetime
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, unquote, urlencode
 import uvicorn
 import logging
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax no disponible: se usa lxml
+    LexborHTMLParser = None
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # User agents rotativos
-USER_AGENTS = [
+USER_AGENTS = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -34,9 +45,9 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/120.0.0.0 Safari/537.36"
-]
+)
 
-GOOGLE_DOMAINS = [
+GOOGLE_DOMAINS = (
     "www.google.com",
     "www.google.es", 
     "www.google.co.uk",
@@ -44,7 +55,63 @@ GOOGLE_DOMAINS = [
     "www.google.com.au",
     "www.google.de",
     "www.google.fr"
-]
+)
+
+# Cabeceras fijas; solo el User-Agent cambia en cada petición
+_BASE_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9,es;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0',
+    'DNT': '1'
+}
+
+# Parámetros de idioma precalculados para los idiomas más usados
+_LANG_PARAMS = {
+    lang: {'hl': lang, 'lr': f'lang_{lang}'}
+    for lang in ('es', 'en', 'fr', 'de', 'it', 'pt')
+}
+
+# Filtros de fecha de Google (parámetro tbs)
+_DATE_RANGE_PARAMS = {
+    'day': 'qdr:d',
+    'week': 'qdr:w',
+    'month': 'qdr:m',
+    'year': 'qdr:y'
+}
+
+# Máximo de búsquedas simultáneas contra Google
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", 8))
+
+# Segundos que se reutiliza una respuesta para la misma búsqueda
+CACHE_TTL = int(os.getenv("SCRAPER_CACHE_TTL", 600))
+
+# Expresiones regulares precompiladas
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s\.,!?;:\-()\'\"áéíóúñüÁÉÍÓÚÑÜ@]', re.IGNORECASE)
+_DATE_RE = re.compile(r'\d{1,2}\s+\w+\s+\d{4}|\d{1,2}/\d{1,2}/\d{4}|\w+\s+\d{1,2},\s+\d{4}')
+_BLOCKED_RE = re.compile(rb'detected unusual traffic|captcha', re.IGNORECASE)
+_URLQ_RE = re.compile(r'^/url\?q=([^&]+)')
+
+# Consultas XPath precompiladas para el parser alternativo con lxml
+_XP_TITLES = etree.XPath(
+    '//div[@data-ved or @data-hveid or contains(concat(" ", normalize-space(@class), " "), " g ")'
+    ' or contains(concat(" ", normalize-space(@class), " "), " rc ")]//h3'
+)
+_XP_CONTAINER = etree.XPath('ancestor::div[@data-ved or @class][1]')
+_XP_LINK = etree.XPath('.//a[@href][1]')
+_XP_SNIPPETS = [etree.XPath(xp) for xp in (
+    './/span[@data-ved][1]',
+    './/*[contains(concat(" ", normalize-space(@class), " "), " s ")][1]',
+    './/*[contains(concat(" ", normalize-space(@class), " "), " st ")][1]',
+    './/div[@data-sncf][1]',
+    './/div[contains(@style, "color")][1]'
+)]
 
 # Modelos Pydantic
 class SearchResult(BaseModel):
@@ -75,75 +142,89 @@ class AdvancedSearchRequest(BaseModel):
 class GoogleScraper:
     def __init__(self):
         self.session = None
-        self.last_request_time = 0
+        # Generador aleatorio propio de esta instancia
+        self._rng = random.Random()
+        self._last_by_domain: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
         self.request_count = 0
         self.rate_limit_reset = time.time()
+        self._sem = asyncio.BoundedSemaphore(MAX_CONCURRENCY)
+        self._session_lock = asyncio.Lock()
+        self._cache = TTLCache(maxsize=2048, ttl=CACHE_TTL)
+        self._ts_cache = (0, '')
+        self._parser_local = threading.local()
         
     async def get_session(self):
-        if self.session is None or self.session.closed:
-            connector = aiohttp.TCPConnector(
-                limit=20,
-                ttl_dns_cache=300,
-                use_dns_cache=True,
-                ssl=False
-            )
-            timeout = aiohttp.ClientTimeout(total=30, connect=10)
-            self.session = aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            )
+        # El lock evita que dos primeras peticiones simultáneas creen dos sesiones
+        async with self._session_lock:
+            if self.session is None or self.session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=64,
+                    limit_per_host=4,
+                    ttl_dns_cache=300,
+                    use_dns_cache=True,
+                    enable_cleanup_closed=True,
+                    keepalive_timeout=75,
+                    ssl=False
+                )
+                timeout = aiohttp.ClientTimeout(total=30, connect=10)
+                self.session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=timeout
+                )
         return self.session
     
     def get_headers(self):
-        return {
-            'User-Agent': random.choice(USER_AGENTS),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9,es;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0',
-            'DNT': '1'
-        }
+        return {'User-Agent': self._rng.choice(USER_AGENTS), **_BASE_HEADERS}
     
-    async def smart_delay(self):
-        """Sistema inteligente de delays para evitar detección"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        # Reset contador cada hora
-        if current_time - self.rate_limit_reset > 3600:
-            self.request_count = 0
-            self.rate_limit_reset = current_time
-        
-        # Calcular delay dinámico
-        base_delay = 2.0
-        random_delay = random.uniform(0.5, 2.5)
-        
-        # Aumentar delay progresivamente con más requests
-        if self.request_count > 20:
-            base_delay += 2.0
-        elif self.request_count > 10:
-            base_delay += 1.0
-        
-        total_delay = base_delay + random_delay
-        
-        if time_since_last < total_delay:
-            sleep_time = total_delay - time_since_last
-            logger.info(f"Aplicando delay de {sleep_time:.2f}s (requests: {self.request_count})")
-            await asyncio.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
+    async def smart_delay(self, domain: str):
+        """Sistema inteligente de delays por dominio para evitar detección"""
+        async with self._locks[domain]:
+            current_time = time.time()
+            time_since_last = current_time - self._last_by_domain.get(domain, 0)
+            
+            # Reset contador cada hora
+            if current_time - self.rate_limit_reset > 3600:
+                self.request_count = 0
+                self.rate_limit_reset = current_time
+            
+            # Calcular delay dinámico
+            base_delay = 2.0
+            random_delay = self._rng.uniform(0.5, 2.5)
+            
+            # Aumentar delay progresivamente con más requests
+            if self.request_count > 20:
+                base_delay += 2.0
+            elif self.request_count > 10:
+                base_delay += 1.0
+            
+            total_delay = base_delay + random_delay
+            
+            if time_since_last < total_delay:
+                sleep_time = total_delay - time_since_last
+                logger.info(f"Aplicando delay de {sleep_time:.2f}s en {domain} (requests: {self.request_count})")
+                await asyncio.sleep(sleep_time)
+            
+            self._last_by_domain[domain] = time.time()
+            self.request_count += 1
+    
+    @property
+    def last_request_time(self) -> float:
+        """Momento de la última petición en cualquier dominio"""
+        return max(self._last_by_domain.values(), default=0)
+    
+    def _now_iso(self) -> str:
+        """Timestamp ISO con resolución de segundos, recalculado como mucho una vez por segundo"""
+        t = int(time.time())
+        if t != self._ts_cache[0]:
+            self._ts_cache = (t, datetime.fromtimestamp(t).isoformat())
+        return self._ts_cache[1]
     
     def clean_text(self, text: str) -> str:
         if not text:
             return ""
-        text = re.sub(r'\s+', ' ', text.strip())
-        text = re.sub(r'[^\w\s\.,!?;:\-()\'\"áéíóúñüÁÉÍÓÚÑÜ@]', '', text, flags=re.IGNORECASE)
+        text = _WS_RE.sub(' ', text.strip())
+        text = _PUNCT_RE.sub('', text)
         return text[:500]  # Limitar longitud
     
     def extract_url(self, href: str) -> str:
@@ -152,11 +233,8 @@ class GoogleScraper:
             return ""
         
         if href.startswith('/url?q='):
-            try:
-                url = href.split('/url?q=')[1].split('&')[0]
-                return url
-            except:
-                return ""
+            match = _URLQ_RE.match(href)
+            return unquote(match.group(1)) if match else ""
         elif href.startswith('http'):
             return href
         elif href.startswith('/search'):
@@ -164,46 +242,49 @@ class GoogleScraper:
         else:
             return href
     
-    def parse_search_results(self, html: str) -> List[Dict[str, Any]]:
+    def parse_search_results(self, html: Union[str, bytes], limit: int = 20) -> List[Dict[str, Any]]:
         """Parser mejorado para resultados de Google"""
-        soup = BeautifulSoup(html, 'html.parser')
-        results = []
+        if LexborHTMLParser is None:
+            return self._parse_search_results_lxml(html, limit)
         
-        # Múltiples selectores para diferentes layouts de Google
-        selectors = [
-            'div[data-ved] h3',
-            'div.g h3', 
-            'div.rc h3',
-            'div[data-hveid] h3',
-            '.g .r h3'
-        ]
+        tree = LexborHTMLParser(html)
+        results = []
         
+        # Selector combinado para los diferentes layouts de Google.
+        # Lexbor devuelve el mismo nodo una vez por cada selector que coincide,
+        # así que deduplicamos conservando el orden del documento
         found_results = []
-        for selector in selectors:
-            elements = soup.select(selector)
-            if elements:
-                found_results = elements
-                break
+        seen_nodes = set()
+        for node in tree.css('div[data-ved] h3, div.g h3, div.rc h3, div[data-hveid] h3, .g .r h3'):
+            if node.mem_id not in seen_nodes:
+                seen_nodes.add(node.mem_id)
+                found_results.append(node)
         
+        seen_urls = set()
         for idx, title_elem in enumerate(found_results[:20]):
             try:
                 # Encontrar contenedor padre
                 container = title_elem
                 for _ in range(5):  # Buscar hasta 5 niveles arriba
                     container = container.parent
-                    if container.name == 'div' and ('data-ved' in container.attrs or 'class' in container.attrs):
+                    if container.tag == 'div' and ('data-ved' in container.attributes or 'class' in container.attributes):
                         break
                 
                 # Extraer título
-                title = self.clean_text(title_elem.get_text())
+                title = self.clean_text(title_elem.text())
                 if not title:
                     continue
                 
                 # Extraer URL
-                link_elem = container.find('a', href=True)
+                link_elem = container.css_first('a[href]')
                 url = ""
                 if link_elem:
-                    url = self.extract_url(link_elem.get('href', ''))
+                    url = self.extract_url(link_elem.attributes.get('href') or '')
+                
+                # Saltar enlaces internos y duplicados antes de extraer el resto
+                if not url.startswith('http') or url in seen_urls:
+                    continue
+                seen_urls.add(url)
                 
                 # Extraer snippet
                 snippet = ""
@@ -216,34 +297,120 @@ class GoogleScraper:
                 ]
                 
                 for sel in snippet_selectors:
-                    snippet_elem = container.select_one(sel)
-                    if snippet_elem and snippet_elem.get_text().strip():
-                        snippet = self.clean_text(snippet_elem.get_text())
+                    snippet_elem = container.css_first(sel)
+                    snippet_text = snippet_elem.text().strip() if snippet_elem else ""
+                    if snippet_text:
+                        snippet = self.clean_text(snippet_text)
                         break
                 
+                # Texto del contenedor, extraído una sola vez por resultado
+                container_text = container.text(separator=' ', strip=True)
+                if not snippet:
+                    snippet = self.clean_text(container_text[:500])
+                
                 # Extraer fecha si existe
-                date = ""
-                date_patterns = [
-                    r'\d{1,2}\s+\w+\s+\d{4}',
-                    r'\d{1,2}/\d{1,2}/\d{4}',
-                    r'\w+\s+\d{1,2},\s+\d{4}'
-                ]
+                match = _DATE_RE.search(container_text)
+                date = match.group() if match else ""
+                
+                results.append({
+                    'title': title,
+                    'url': url,
+                    'snippet': snippet,
+                    'date': date,
+                    'position': len(results) + 1
+                })
+                if len(results) >= limit:
+                    break
+                    
+            except Exception as e:
+                logger.warning(f"Error parsing result {idx}: {e}")
+                continue
+        
+        return results
+    
+    def _decode_body(self, body: bytes, charset: Optional[str]) -> Union[str, bytes]:
+        """Deja los bytes tal cual si son UTF-8; si no, los decodifica con el charset de la respuesta"""
+        if not charset:
+            return body
+        try:
+            codec = codecs.lookup(charset).name
+        except LookupError:
+            return body
+        if codec == 'utf-8':
+            return body
+        return body.decode(codec, errors='replace')
+    
+    def _get_lxml_parser(self) -> lxml.html.HTMLParser:
+        """Parser lxml reutilizable, uno por hilo porque no es thread-safe"""
+        parser = getattr(self._parser_local, 'parser', None)
+        if parser is None:
+            # Los bytes llegan siempre como UTF-8 (_decode_body convierte el resto a str);
+            # sin indicarlo lxml los interpretaría como Latin-1
+            parser = lxml.html.HTMLParser(encoding='utf-8', recover=True, remove_blank_text=True)
+            self._parser_local.parser = parser
+        return parser
+    
+    def _parse_search_results_lxml(self, html: Union[str, bytes], limit: int = 20) -> List[Dict[str, Any]]:
+        """Parser alternativo con lxml si selectolax no está instalado"""
+        try:
+            tree = lxml.html.fromstring(html, parser=self._get_lxml_parser())
+        except etree.ParserError:  # Documento vacío
+            return []
+        results = []
+        
+        # Una sola consulta XPath para los diferentes layouts de Google
+        found_results = _XP_TITLES(tree)
+        
+        seen_urls = set()
+        for idx, title_elem in enumerate(found_results[:20]):
+            try:
+                # Encontrar contenedor padre con una única consulta de ancestros
+                ancestors = _XP_CONTAINER(title_elem)
+                container = ancestors[0] if ancestors else title_elem.getparent()
+                
+                # Extraer título
+                title = self.clean_text(title_elem.text_content())
+                if not title:
+                    continue
+                
+                # Extraer URL
+                link_elems = _XP_LINK(container)
+                url = ""
+                if link_elems:
+                    url = self.extract_url(link_elems[0].get('href', ''))
                 
-                container_text = container.get_text()
-                for pattern in date_patterns:
-                    match = re.search(pattern, container_text)
-                    if match:
-                        date = match.group()
+                # Saltar enlaces internos y duplicados antes de extraer el resto
+                if not url.startswith('http') or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                
+                # Extraer snippet
+                snippet = ""
+                for xp in _XP_SNIPPETS:
+                    snippet_elems = xp(container)
+                    snippet_text = snippet_elems[0].text_content().strip() if snippet_elems else ""
+                    if snippet_text:
+                        snippet = self.clean_text(snippet_text)
                         break
                 
-                if title and url and url.startswith('http'):
-                    results.append({
-                        'title': title,
-                        'url': url,
-                        'snippet': snippet,
-                        'date': date,
-                        'position': len(results) + 1
-                    })
+                # Texto del contenedor, extraído una sola vez por resultado
+                container_text = ' '.join(container.itertext())
+                if not snippet:
+                    snippet = self.clean_text(container_text[:500])
+                
+                # Extraer fecha si existe
+                match = _DATE_RE.search(container_text)
+                date = match.group() if match else ""
+                
+                results.append({
+                    'title': title,
+                    'url': url,
+                    'snippet': snippet,
+                    'date': date,
+                    'position': len(results) + 1
+                })
+                if len(results) >= limit:
+                    break
                     
             except Exception as e:
                 logger.warning(f"Error parsing result {idx}: {e}")
@@ -252,19 +419,24 @@ class GoogleScraper:
         return results
     
     async def search(self, query: str, num_results: int = 10, language: str = 'es', 
-                    safe_search: bool = False, **kwargs) -> Dict[str, Any]:
+                    safe_search: bool = False, max_retries: int = 3, **kwargs) -> Dict[str, Any]:
         """Búsqueda principal en Google"""
-        await self.smart_delay()
-        
-        session = await self.get_session()
-        domain = random.choice(GOOGLE_DOMAINS)
+        # Reutilizar la respuesta si la misma búsqueda se hizo hace poco
+        cache_key = (
+            query.strip().lower(), num_results, language, safe_search,
+            kwargs.get('site'), kwargs.get('filetype'), kwargs.get('date_range')
+        )
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Cache hit: {query}")
+            return {**cached, 'query': query}
         
         # Construir parámetros de búsqueda
+        lang_params = _LANG_PARAMS.get(language) or {'hl': language, 'lr': f'lang_{language}'}
         params = {
             'q': query,
             'num': min(num_results + 5, 50),  # Pedir más para compensar filtrados
-            'hl': language,
-            'lr': f'lang_{language}',
+            **lang_params,
             'safe': 'active' if safe_search else 'off',
             'start': 0
         }
@@ -276,67 +448,105 @@ class GoogleScraper:
             params['q'] += f" filetype:{kwargs['filetype']}"
         if 'date_range' in kwargs and kwargs['date_range']:
             # Google usa parámetros específicos para fechas
-            date_params = {
-                'day': 'd',
-                'week': 'w', 
-                'month': 'm',
-                'year': 'y'
-            }
-            if kwargs['date_range'] in date_params:
-                params['tbs'] = f"qdr:{date_params[kwargs['date_range']]}"
-        
-        query_string = '&'.join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
-        url = f"https://{domain}/search?{query_string}"
+            if kwargs['date_range'] in _DATE_RANGE_PARAMS:
+                params['tbs'] = _DATE_RANGE_PARAMS[kwargs['date_range']]
         
-        logger.info(f"Searching: {query} on {domain}")
+        query_string = urlencode(params, quote_via=quote_plus)
         
-        try:
-            headers = self.get_headers()
+        # Reintentos acotados con backoff exponencial ante bloqueos o errores 5xx
+        error = 'blocked'
+        domain = ''
+        for attempt in range(max_retries):
+            if attempt > 0:
+                await self._backoff(attempt - 1)
+            
+            domain = self._rng.choice(GOOGLE_DOMAINS)
+            await self.smart_delay(domain)
+            
+            session = await self.get_session()
+            url = f"https://{domain}/search?{query_string}"
+            
+            logger.info(f"Searching: {query} on {domain} (intento {attempt + 1}/{max_retries})")
+            
+            try:
+                headers = self.get_headers()
+                
+                # El semáforo limita las peticiones en vuelo; se libera antes de parsear
+                async with self._sem:
+                    async with session.get(url, headers=headers, allow_redirects=True) as response:
+                        status = response.status
+                        charset = response.charset
+                        html = await response.read() if status == 200 else b""
+            except Exception as e:
+                logger.error(f"Error searching '{query}': {e}")
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'query': query,
+                    'results_count': 0,
+                    'results': [],
+                    'timestamp': self._now_iso(),
+                    'source': domain
+                }
+            
+            if status == 200:
+                # Verificar si Google nos está bloqueando
+                if _BLOCKED_RE.search(html):
+                    logger.warning("Google detectó tráfico inusual - rotando dominio")
+                    error = 'blocked'
+                    continue
+                
+                html = self._decode_body(html, charset)
+                
+                # Parsear en un hilo para no bloquear el event loop
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(None, self.parse_search_results, html, num_results)
+                
+                result = {
+                    'success': True,
+                    'query': query,
+                    'results_count': len(results),
+                    'results': results,
+                    'timestamp': self._now_iso(),
+                    'source': domain
+                }
+                # No cachear páginas sin resultados (consentimiento, layout desconocido...)
+                if results:
+                    self._cache[cache_key] = result
+                return result
+            
+            logger.error(f"HTTP {status} for query: {query}")
+            if status == 429 or status >= 500:
+                error = 'blocked' if status == 429 else f'HTTP {status}'
+                continue
             
-            async with session.get(url, headers=headers, allow_redirects=True) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    
-                    # Verificar si Google nos está bloqueando
-                    if 'detected unusual traffic' in html.lower() or 'captcha' in html.lower():
-                        logger.warning("Google detectó tráfico inusual - rotando dominio")
-                        # Intentar con otro dominio
-                        return await self._retry_with_different_domain(query, num_results, language, safe_search, **kwargs)
-                    
-                    results = self.parse_search_results(html)
-                    
-                    return {
-                        'success': True,
-                        'query': query,
-                        'results_count': len(results),
-                        'results': results[:num_results],
-                        'timestamp': datetime.now().isoformat(),
-                        'source': domain,
-                        'total_found': len(results)
-                    }
-                else:
-                    logger.error(f"HTTP {response.status} for query: {query}")
-                    return {
-                        'success': False,
-                        'error': f'HTTP {response.status}',
-                        'query': query,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    
-        except Exception as e:
-            logger.error(f"Error searching '{query}': {e}")
             return {
                 'success': False,
-                'error': str(e),
+                'error': f'HTTP {status}',
                 'query': query,
-                'timestamp': datetime.now().isoformat()
+                'results_count': 0,
+                'results': [],
+                'timestamp': self._now_iso(),
+                'source': domain
             }
+        
+        logger.error(f"Reintentos agotados para '{query}' tras {max_retries} intentos")
+        return {
+            'success': False,
+            'error': error,
+            'attempts': max_retries,
+            'query': query,
+            'results_count': 0,
+            'results': [],
+            'timestamp': self._now_iso(),
+            'source': domain
+        }
     
-    async def _retry_with_different_domain(self, query: str, num_results: int, 
-                                         language: str, safe_search: bool, **kwargs):
-        """Reintenta búsqueda con dominio diferente si hay bloqueo"""
-        await asyncio.sleep(random.uniform(3, 7))  # Delay extra
-        return await self.search(query, num_results, language, safe_search, **kwargs)
+    async def _backoff(self, attempt: int, base: float = 3.0):
+        """Espera exponencial con jitter antes de reintentar con otro dominio"""
+        delay = min(60, base * 2 ** attempt) + self._rng.uniform(0, 1)
+        logger.info(f"Reintentando en {delay:.2f}s")
+        await asyncio.sleep(delay)
     
     async def close(self):
         if self.session and not self.session.closed:
@@ -351,7 +561,8 @@ app = FastAPI(
     description="API para realizar búsquedas en Google sin limitaciones usando web scraping",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configurar CORS
@@ -363,6 +574,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    # Crear la sesión HTTP al arrancar para no pagarlo en la primera búsqueda
+    await scraper.get_session()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     await scraper.close()
@@ -380,7 +596,7 @@ async def root():
         }
     }
 
-@app.get("/search", response_model=SearchResponse, summary="Búsqueda Simple")
+@app.get("/search", responses={200: {"model": SearchResponse}}, summary="Búsqueda Simple")
 async def search_google(
     q: str = Query(..., description="Término de búsqueda"),
     num: int = Query(10, ge=1, le=50, description="Número de resultados"),
@@ -390,12 +606,12 @@ async def search_google(
     """Realiza una búsqueda simple en Google"""
     try:
         result = await scraper.search(q, num, lang, safe)
-        return SearchResponse(**result)
+        return ORJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in search endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/search/advanced", response_model=SearchResponse, summary="Búsqueda Avanzada")
+@app.post("/search/advanced", responses={200: {"model": SearchResponse}}, summary="Búsqueda Avanzada")
 async def advanced_search(request: AdvancedSearchRequest):
     """Realiza una búsqueda avanzada con filtros adicionales"""
     try:
@@ -408,12 +624,12 @@ async def advanced_search(request: AdvancedSearchRequest):
             filetype=request.filetype,
             date_range=request.date_range
         )
-        return SearchResponse(**result)
+        return ORJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in advanced search endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/search/site/{site_domain}", response_model=SearchResponse, summary="Buscar en Sitio Específico")
+@app.get("/search/site/{site_domain}", responses={200: {"model": SearchResponse}}, summary="Buscar en Sitio Específico")
 async def search_in_site(
     site_domain: str,
     q: str = Query(..., description="Término de búsqueda"),
@@ -428,12 +644,12 @@ async def search_in_site(
             language=lang,
             site=site_domain
         )
-        return SearchResponse(**result)
+        return ORJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in site search endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/search/filetype/{file_type}", response_model=SearchResponse, summary="Buscar Tipo de Archivo")
+@app.get("/search/filetype/{file_type}", responses={200: {"model": SearchResponse}}, summary="Buscar Tipo de Archivo")
 async def search_filetype(
     file_type: str,
     q: str = Query(..., description="Término de búsqueda"),
@@ -448,7 +664,7 @@ async def search_filetype(
             language=lang,
             filetype=file_type
         )
-        return SearchResponse(**result)
+        return ORJSONResponse(result)
     except Exception as e:
         logger.error(f"Error in filetype search endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -472,6 +688,7 @@ async def reset_scraper():
         await scraper.close()
         scraper.session = None
         scraper.request_count = 0
+        scraper._cache.clear()
         scraper.rate_limit_reset = time.time()
         return {"message": "Scraper reset successfully"}
     except Exception as e:
@@ -5,23 +5,32 @@ Servidor MCP para realizar búsquedas en Google sin limitaciones usando web scra
 """
 
 import asyncio
-import json
+import codecs
 import random
-import time
+import sys
+from collections import defaultdict, deque
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from urllib.parse import quote_plus, urljoin
+from typing import List, Dict, Any, Optional, Tuple, Union
+from urllib.parse import unquote, urljoin
 import re
 
 import aiohttp
-from bs4 import BeautifulSoup
+import orjson
+from aiohttp.resolver import AsyncResolver
+from selectolax.lexbor import LexborHTMLParser
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 import mcp.server.stdio
 import mcp.types as types
 
+try:
+    import aiodns  # noqa: F401  (necesario para AsyncResolver)
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
 # User agents rotativos para evadir detección
-USER_AGENTS = [
+USER_AGENTS = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -30,10 +39,10 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/120.0.0.0 Safari/537.36"
-]
+)
 
 # Dominios de Google para rotación
-GOOGLE_DOMAINS = [
+GOOGLE_DOMAINS = (
     "www.google.com",
     "www.google.es",
     "www.google.co.uk",
@@ -41,18 +50,49 @@ GOOGLE_DOMAINS = [
     "www.google.com.au",
     "www.google.de",
     "www.google.fr"
-]
+)
+
+# Cabeceras fijas; solo el User-Agent cambia en cada petición
+_BASE_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0'
+}
+
+# Máximo de búsquedas simultáneas contra Google
+MAX_CONCURRENCY = 8
+
+# Expresiones regulares precompiladas
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s\.,!?;:\-()\'\"áéíóúñü]', re.IGNORECASE)
+_DATE_RE = re.compile(r'\d{1,2}\s+\w+\s+\d{4}')
+_URLQ_RE = re.compile(r'^/url\?q=([^&]+)')
 
 class GoogleScraper:
     def __init__(self):
         self.session = None
-        self.last_request_time = 0
-        self.request_count = 0
+        # Estado de rate limiting por dominio: (última petición, número de peticiones)
+        self._domain_state: Dict[str, Tuple[float, int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._sem = asyncio.BoundedSemaphore(MAX_CONCURRENCY)
+        # Elecciones aleatorias precalculadas por lotes
+        self._ua_buf = deque()
+        self._domain_buf = deque()
         
     async def get_session(self):
         if self.session is None or self.session.closed:
+            # Resolución DNS asíncrona con aiodns en lugar del pool de hilos de getaddrinfo
+            resolver = AsyncResolver() if HAS_AIODNS else None
             connector = aiohttp.TCPConnector(
-                limit=10,
+                resolver=resolver,
+                limit=100,
+                limit_per_host=16,
                 ttl_dns_cache=300,
                 use_dns_cache=True,
                 ssl=False
@@ -64,81 +104,115 @@ class GoogleScraper:
             )
         return self.session
     
+    def _next_choice(self, buf: deque, population: tuple) -> str:
+        """Saca la siguiente elección del buffer, rellenándolo de 64 en 64"""
+        if not buf:
+            buf.extend(random.choices(population, k=64))
+        return buf.popleft()
+    
     def get_headers(self):
-        return {
-            'User-Agent': random.choice(USER_AGENTS),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0'
-        }
+        return {'User-Agent': self._next_choice(self._ua_buf, USER_AGENTS), **_BASE_HEADERS}
     
-    async def delay_request(self):
-        """Implementa delay aleatorio entre requests para evitar detección"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        # Delay base + aleatorio
-        min_delay = 1.5 + random.uniform(0.5, 2.0)
-        
-        # Aumentar delay si hacemos muchas requests
-        if self.request_count > 10:
-            min_delay += random.uniform(1.0, 3.0)
-        
-        if time_since_last < min_delay:
-            await asyncio.sleep(min_delay - time_since_last)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
+    async def delay_request(self, domain: str):
+        """Implementa delay aleatorio entre requests al mismo dominio para evitar detección"""
+        async with self._locks[domain]:
+            # Reloj monotónico del event loop: no le afectan los ajustes del reloj del sistema
+            loop = asyncio.get_running_loop()
+            last_request_time, request_count = self._domain_state.get(domain, (float('-inf'), 0))
+            time_since_last = loop.time() - last_request_time
+            
+            # Delay base + aleatorio
+            min_delay = 1.5 + random.uniform(0.5, 2.0)
+            
+            # Aumentar delay si hacemos muchas requests a este dominio
+            if request_count > 10:
+                min_delay += random.uniform(1.0, 3.0)
+            
+            if time_since_last < min_delay:
+                await asyncio.sleep(min_delay - time_since_last)
+            
+            self._domain_state[domain] = (loop.time(), request_count + 1)
     
     def clean_text(self, text: str) -> str:
         """Limpia y normaliza texto extraído"""
         if not text:
             return ""
         # Remover espacios extra y caracteres especiales
-        text = re.sub(r'\s+', ' ', text.strip())
-        text = re.sub(r'[^\w\s\.,!?;:\-()\'\"áéíóúñü]', '', text, flags=re.IGNORECASE)
+        text = _WS_RE.sub(' ', text.strip())
+        text = _PUNCT_RE.sub('', text)
         return text
     
-    def parse_search_results(self, html: str) -> List[Dict[str, Any]]:
+    def _decode_body(self, body: bytes, charset: Optional[str]) -> Union[str, bytes]:
+        """Deja los bytes tal cual si son UTF-8; si no, los decodifica con el charset de la respuesta"""
+        if not charset:
+            return body
+        try:
+            codec = codecs.lookup(charset).name
+        except LookupError:
+            return body
+        if codec == 'utf-8':
+            return body
+        return body.decode(codec, errors='replace')
+    
+    def parse_search_results(self, html: Union[str, bytes]) -> List[Dict[str, Any]]:
         """Extrae resultados de búsqueda del HTML de Google"""
-        soup = BeautifulSoup(html, 'html.parser')
+        tree = LexborHTMLParser(html)
         results = []
         
         # Buscar contenedores de resultados
-        result_containers = soup.find_all('div', class_='g') or soup.find_all('div', {'data-ved': True})
+        result_containers = tree.css('div.g') or tree.css('div[data-ved]')
         
         for container in result_containers[:15]:  # Limitar a 15 resultados
             try:
+                # Un único recorrido del contenedor para todos los campos
+                title_elem = alt_title_elem = link_elem = None
+                snippet_elem = alt_snippet_elem = None
+                date = ""
+                for node in container.css('h3, a, span, div.s'):
+                    tag = node.tag
+                    attrs = node.attributes
+                    if tag == 'h3':
+                        if title_elem is None:
+                            title_elem = node
+                    elif tag == 'a':
+                        if link_elem is None and 'href' in attrs:
+                            link_elem = node
+                        if alt_title_elem is None and 'data-ved' in attrs:
+                            alt_title_elem = node
+                    elif tag == 'span':
+                        if snippet_elem is None and 'data-ved' in attrs:
+                            snippet_elem = node
+                        if not date and _DATE_RE.search(node.text(deep=False)):
+                            date = node.text()
+                    elif alt_snippet_elem is None:  # div.s
+                        alt_snippet_elem = node
+                    
+                    if title_elem is not None and link_elem is not None and snippet_elem is not None and date:
+                        break
+                
                 # Extraer título
-                title_elem = container.find('h3') or container.find('a', {'data-ved': True})
-                title = self.clean_text(title_elem.get_text()) if title_elem else ""
+                if title_elem is None:
+                    title_elem = alt_title_elem
+                title = self.clean_text(title_elem.text()) if title_elem is not None else ""
                 
                 # Extraer URL
-                link_elem = container.find('a', href=True)
                 url = ""
-                if link_elem and link_elem.get('href'):
-                    href = link_elem['href']
-                    if href.startswith('/url?q='):
-                        url = href.split('/url?q=')[1].split('&')[0]
-                    elif href.startswith('http'):
-                        url = href
+                if link_elem is not None and link_elem.attributes.get('href'):
+                    href = link_elem.attributes['href']
+                    match = _URLQ_RE.match(href)
+                    url = unquote(match.group(1)) if match else (href if href.startswith('http') else "")
                 
                 # Extraer snippet/descripción
-                snippet_elem = container.find('span', {'data-ved': True}) or container.find('div', class_='s')
-                if not snippet_elem:
-                    snippet_elem = container.find_all('div')[-1] if container.find_all('div') else None
+                if snippet_elem is None:
+                    snippet_elem = alt_snippet_elem
+                if snippet_elem is None:
+                    # Último div hijo directo, sin recorrer todos los descendientes
+                    snippet_elem = next(
+                        (child for child in reversed(list(container.iter())) if child.tag == 'div'),
+                        None
+                    )
                 
-                snippet = self.clean_text(snippet_elem.get_text()) if snippet_elem else ""
-                
-                # Extraer fecha si está disponible
-                date_elem = container.find('span', string=re.compile(r'\d{1,2}\s+\w+\s+\d{4}'))
-                date = date_elem.get_text() if date_elem else ""
+                snippet = self.clean_text(snippet_elem.text()) if snippet_elem is not None else ""
                 
                 if title and url:
                     results.append({
@@ -156,10 +230,10 @@ class GoogleScraper:
     
     async def search(self, query: str, num_results: int = 10, lang: str = 'es') -> Dict[str, Any]:
         """Realiza búsqueda en Google"""
-        await self.delay_request()
+        domain = self._next_choice(self._domain_buf, GOOGLE_DOMAINS)
+        await self.delay_request(domain)
         
         session = await self.get_session()
-        domain = random.choice(GOOGLE_DOMAINS)
         
         # Construir URL de búsqueda
         params = {
@@ -170,39 +244,44 @@ class GoogleScraper:
             'safe': 'off'
         }
         
-        query_string = '&'.join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
-        url = f"https://{domain}/search?{query_string}"
+        url = f"https://{domain}/search"
         
         try:
             headers = self.get_headers()
             
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    results = self.parse_search_results(html)
-                    
-                    return {
-                        'success': True,
-                        'query': query,
-                        'results_count': len(results),
-                        'results': results[:num_results],
-                        'timestamp': datetime.now().isoformat(),
-                        'source': domain
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': f'HTTP {response.status}',
-                        'query': query,
-                        'timestamp': datetime.now().isoformat()
-                    }
+            # El semáforo limita las peticiones en vuelo; se libera antes de parsear
+            async with self._sem:
+                async with session.get(url, params=params, headers=headers) as response:
+                    status = response.status
+                    charset = response.charset
+                    html = await response.read() if status == 200 else b""
+            
+            if status == 200:
+                html = self._decode_body(html, charset)
+                results = self.parse_search_results(html)
+                
+                return {
+                    'success': True,
+                    'query': query,
+                    'results_count': len(results),
+                    'results': results[:num_results],
+                    'timestamp': datetime.now(),
+                    'source': domain
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': f'HTTP {status}',
+                    'query': query,
+                    'timestamp': datetime.now()
+                }
                     
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
                 'query': query,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now()
             }
     
     async def close(self):
@@ -212,6 +291,10 @@ class GoogleScraper:
 # Instancia global del scraper
 scraper = GoogleScraper()
 
+def to_json(data: Dict[str, Any]) -> str:
+    """Serializa la respuesta de una herramienta (orjson convierte los datetime a ISO 8601)"""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+
 # Crear servidor MCP
 app = Server("google-scraper")
 
@@ -291,13 +374,13 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
         if not query:
             return [types.TextContent(
                 type="text",
-                text=json.dumps({"error": "Query parameter is required"}, indent=2)
+                text=to_json({"error": "Query parameter is required"})
             )]
         
         result = await scraper.search(query, num_results, language)
         return [types.TextContent(
             type="text",
-            text=json.dumps(result, indent=2, ensure_ascii=False)
+            text=to_json(result)
         )]
     
     elif name == "google_search_advanced":
@@ -310,7 +393,7 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
         if not query:
             return [types.TextContent(
                 type="text", 
-                text=json.dumps({"error": "Query parameter is required"}, indent=2)
+                text=to_json({"error": "Query parameter is required"})
             )]
         
         # Construir query avanzada
@@ -323,13 +406,13 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
         result = await scraper.search(advanced_query, num_results)
         return [types.TextContent(
             type="text",
-            text=json.dumps(result, indent=2, ensure_ascii=False)
+            text=to_json(result)
         )]
     
     else:
         return [types.TextContent(
             type="text",
-            text=json.dumps({"error": f"Unknown tool: {name}"}, indent=2)
+            text=to_json({"error": f"Unknown tool: {name}"})
         )]
 
 async def main():
@@ -351,4 +434,14 @@ async def main():
         await scraper.close()
 
 if __name__ == "__main__":
+    if sys.platform == "win32":
+        # aiodns no funciona con el ProactorEventLoop por defecto de Windows
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    else:
+        # Usar uvloop si está instalado
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
     asyncio.run(main())
\ No newline at end of file